@@ -3,16 +3,17 @@ AI PDF Voice Assistant — FastAPI entry point.
 Wires up all routers, middleware, and serves the SPA frontend.
 """
 from contextlib import asynccontextmanager
-import glob, os
+import glob, os, time
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 
-from config import STATIC_DIR, UPLOAD_DIR
+from config import STATIC_DIR, UPLOAD_DIR, METRICS_ENABLED
 from database import engine, Base
-from routers import auth_router, chat_router, pdf_router
+from routers import auth_router, chat_router, pdf_router, metrics_router
+from services import metrics
 
 
 # ── Startup / shutdown ────────────────────────────────
@@ -41,12 +42,46 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+
+# ── Per-stage timing ──────────────────────────────────
+if METRICS_ENABLED:
+    @app.middleware("http")
+    async def server_timing(request: Request, call_next):
+        timings = metrics.start_request()
+        t0 = time.perf_counter()
+        response = await call_next(request)
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+
+        if "content-length" not in response.headers:
+            # Streamed body (e.g. ask_batch): headers go out before the work is done,
+            # so Server-Timing only covers stages finished so far and has no "total".
+            # The route histogram is observed once the body has been fully sent.
+            body = response.body_iterator
+
+            async def timed_body():
+                try:
+                    async for chunk in body:
+                        yield chunk
+                finally:
+                    metrics.request_duration.observe(route, time.perf_counter() - t0)
+
+            response.body_iterator = timed_body()
+        else:
+            elapsed = time.perf_counter() - t0
+            metrics.request_duration.observe(route, elapsed)
+            timings["total"] = elapsed
+        response.headers["Server-Timing"] = metrics.server_timing_header(timings)
+        return response
+
 # ── Routers ───────────────────────────────────────────
 app.include_router(auth_router.router)
 app.include_router(chat_router.router)
 app.include_router(pdf_router.router)
+if METRICS_ENABLED:
+    app.include_router(metrics_router.router)
 
 # ── Static files ──────────────────────────────────────
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
@@ -0,0 +1,3 @@
+"""
+End-to-end benchmark harness — fake LLM server, synthetic fixtures, load runner.
+"""
@@ -0,0 +1,64 @@
+"""
+Compare two benchmark result files and flag regressions.
+
+    python -m bench.compare baseline.json candidate.json [--threshold 0.10]
+
+Exits with status 1 if any endpoint's p95 latency or peak RSS grew, or its
+throughput dropped, by more than the threshold.
+"""
+import argparse
+import json
+import sys
+
+# metric → True if higher is better
+_METRICS = {
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "throughput_rps": True,
+    "peak_rss_mb": False,
+}
+_GATED = ("p95_ms", "throughput_rps", "peak_rss_mb")
+
+
+def _change(old: float, new: float) -> float:
+    return (new - old) / old if old else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark JSON results")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative change treated as a regression (default 0.10)")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        base = json.load(f)
+    with open(args.candidate) as f:
+        cand = json.load(f)
+
+    print(f"baseline {base.get('commit')}  →  candidate {cand.get('commit')}")
+    regressions = []
+    for endpoint in sorted(set(base["endpoints"]) | set(cand["endpoints"])):
+        old, new = base["endpoints"].get(endpoint), cand["endpoints"].get(endpoint)
+        if old is None or new is None:
+            print(f"\n{endpoint}: only in {'candidate' if old is None else 'baseline'}")
+            continue
+        print(f"\n{endpoint}")
+        for metric, higher_is_better in _METRICS.items():
+            delta = _change(old[metric], new[metric])
+            worse = -delta if higher_is_better else delta
+            flag = ""
+            if metric in _GATED and worse > args.threshold:
+                flag = "  REGRESSION"
+                regressions.append((endpoint, metric))
+            print(f"  {metric:<15} {old[metric]:>10} → {new[metric]:>10}  ({delta:+.1%}){flag}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Chunk-embedding throughput benchmark — runs the index build pipeline over
+synthetic PDFs for each (batch size, thread count) configuration and reports
+chunks per second, next to the old FAISS.from_documents path.
+
+    python -m bench.embed_bench --pdfs 4 --pages 20 --batch-sizes 16,64,256 --threads 1,2,4
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _ints(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding pipeline throughput benchmark")
+    parser.add_argument("--pdfs", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=20, help="pages per PDF")
+    parser.add_argument("--batch-sizes", type=_ints, default=[16, 64, 256])
+    parser.add_argument("--threads", type=_ints,
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--normalize", action="store_true")
+    parser.add_argument("--repeat", type=int, default=2, help="timed runs per configuration (best is kept)")
+    parser.add_argument("--skip-baseline", action="store_true",
+                        help="skip the FAISS.from_documents comparison")
+    parser.add_argument("--out", help="write results as JSON")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    from langchain_community.document_loaders import PDFPlumberLoader
+    from langchain_community.vectorstores import FAISS
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    from bench.fixtures import make_pdf
+    from services import llm_service as ls
+
+    workdir = tempfile.mkdtemp(prefix="embed_bench_")
+    paths = []
+    for i in range(args.pdfs):
+        path = os.path.join(workdir, f"doc_{i}.pdf")
+        with open(path, "wb") as f:
+            f.write(make_pdf(pages=args.pages, seed=i))
+        paths.append(path)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=200)
+
+    # Warm-up: model weights, tokenizer and thread pools
+    ls.embed_chunks(paths[:1], splitter)
+
+    results = []
+
+    def report(name: str, chunks: int, seconds: float, **cfg):
+        rate = chunks / seconds if seconds else 0.0
+        results.append({"config": name, **cfg, "chunks": chunks,
+                        "seconds": round(seconds, 3), "chunks_per_sec": round(rate, 1)})
+        print(f"  {name:<28} {chunks:>6} chunks  {seconds:>8.2f}s  {rate:>9.1f} chunks/s")
+
+    print(f"{args.pdfs} PDFs × {args.pages} pages, normalize={args.normalize}")
+    if not args.skip_baseline:
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            chunks = []
+            for path in paths:
+                chunks.extend(splitter.split_documents(PDFPlumberLoader(path).load()))
+            FAISS.from_documents(chunks, ls.embeddings)
+            best = min(best, time.perf_counter() - t0)
+        report("baseline from_documents", len(chunks), best)
+
+    for threads in args.threads:
+        ls.set_embedding_threads(threads)
+        for batch_size in args.batch_sizes:
+            best = float("inf")
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                docs, matrix = ls.embed_chunks(paths, splitter, batch_size=batch_size,
+                                               normalize=args.normalize)
+                ls._faiss_from_matrix(docs, matrix)
+                best = min(best, time.perf_counter() - t0)
+            report(f"pipeline b={batch_size} t={threads}", len(docs), best,
+                   batch_size=batch_size, threads=threads)
+
+    fastest = max(results, key=lambda r: r["chunks_per_sec"])
+    print(f"Fastest: {fastest['config']} ({fastest['chunks_per_sec']} chunks/s)")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"pdfs": args.pdfs, "pages": args.pages,
+                       "normalize": args.normalize, "results": results}, f, indent=2)
+        print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
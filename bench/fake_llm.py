@@ -0,0 +1,164 @@
+"""
+Local OpenAI-compatible stub server for benchmarking.
+Serves /v1/models and /v1/chat/completions (plain and streamed) with a
+configurable first-token latency and token rate, so the app can be load
+tested without a real model behind LLM_BASE_URL.
+
+    python -m bench.fake_llm --port 1235 --latency 0.2 --tokens-per-sec 40
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_WORDS = (
+    "the document describes a process for handling requests and the results "
+    "show that performance depends on the size of the input and the model"
+).split()
+
+
+class FakeLLMConfig:
+    def __init__(self, latency: float = 0.2, tokens_per_sec: float = 40.0,
+                 max_tokens: int = 60, no_data_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.max_tokens = max_tokens
+        self.no_data_rate = no_data_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def next_reply(self) -> list[str]:
+        """Return the token list for the next completion."""
+        with self.lock:
+            self.requests += 1
+            if self.rng.random() < self.no_data_rate:
+                return ["NO_DATA"]
+            return [self.rng.choice(_WORDS) for _ in range(self.max_tokens)]
+
+
+def _make_handler(cfg: FakeLLMConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):  # keep benchmark output clean
+            pass
+
+        def _send_json(self, status: int, body: dict):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._send_json(200, {
+                    "object": "list",
+                    "data": [{"id": "fake-llm", "object": "model", "owned_by": "bench"}],
+                })
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+
+            length = int(self.headers.get("Content-Length", 0))
+            req = json.loads(self.rfile.read(length) or b"{}")
+            model = req.get("model", "fake-llm")
+            tokens = cfg.next_reply()
+            per_token = 1.0 / cfg.tokens_per_sec if cfg.tokens_per_sec > 0 else 0.0
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+            time.sleep(cfg.latency)
+
+            if req.get("stream"):
+                self._stream(completion_id, model, tokens, per_token)
+                return
+
+            time.sleep(per_token * len(tokens))
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": 0,
+                    "completion_tokens": len(tokens),
+                    "total_tokens": len(tokens),
+                },
+            })
+
+        def _stream(self, completion_id: str, model: str, tokens: list[str], per_token: float):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            def chunk(delta: dict, finish=None):
+                payload = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+                }
+                self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            chunk({"role": "assistant", "content": ""})
+            for i, tok in enumerate(tokens):
+                time.sleep(per_token)
+                chunk({"content": tok if i == 0 else " " + tok})
+            chunk({}, finish="stop")
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0,
+                 cfg: FakeLLMConfig | None = None) -> ThreadingHTTPServer:
+    """Start the stub in a daemon thread. Use server.server_address for the bound port."""
+    server = ThreadingHTTPServer((host, port), _make_handler(cfg or FakeLLMConfig()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible fake LLM for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1235)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=40.0)
+    parser.add_argument("--max-tokens", type=int, default=60, help="tokens per reply")
+    parser.add_argument("--no-data-rate", type=float, default=0.0,
+                        help="fraction of replies that are NO_DATA (exercises the fallback path)")
+    args = parser.parse_args()
+
+    cfg = FakeLLMConfig(args.latency, args.tokens_per_sec, args.max_tokens, args.no_data_rate)
+    server = ThreadingHTTPServer((args.host, args.port), _make_handler(cfg))
+    server.daemon_threads = True
+    print(f"Fake LLM listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Synthetic benchmark inputs — multi-page text PDFs and canned WAV audio,
+generated with the standard library only.
+"""
+import io
+import math
+import random
+import struct
+import wave
+
+_VOCAB = (
+    "invoice contract payment delivery schedule warranty clause section "
+    "report revenue quarter growth customer service policy employee safety "
+    "training procedure equipment maintenance inspection record approval"
+).split()
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: int = 5, lines_per_page: int = 40, seed: int = 0) -> bytes:
+    """Build a valid text PDF with `pages` pages of pseudo-random sentences."""
+    rng = random.Random(seed)
+    objects: list[bytes] = []
+
+    # 1: catalog, 2: pages tree, 3: font — page objects follow
+    page_ids = [4 + 2 * i for i in range(pages)]
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    for p in range(pages):
+        lines = ["BT", "/F1 10 Tf", "50 780 Td", "12 TL"]
+        lines.append(f"(Page {p + 1} section {rng.randint(1, 99)}) Tj T*")
+        for _ in range(lines_per_page):
+            sentence = " ".join(rng.choice(_VOCAB) for _ in range(12)).capitalize() + "."
+            lines.append(f"({_pdf_escape(sentence)}) Tj T*")
+        lines.append("ET")
+        stream = "\n".join(lines).encode("latin-1")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_ids[p] + 1} 0 R >>".encode()
+        )
+        objects.append(
+            f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream"
+        )
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{i} 0 obj\n".encode() + body + b"\nendobj\n")
+    xref_pos = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n".encode())
+    out.write(b"0000000000 65535 f \n")
+    for off in offsets:
+        out.write(f"{off:010d} 00000 n \n".encode())
+    out.write(
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref_pos}\n%%EOF\n".encode()
+    )
+    return out.getvalue()
+
+
+def make_wav(seconds: float = 2.0, rate: int = 16000, freq: float = 220.0) -> bytes:
+    """Build a 16 kHz mono PCM WAV containing a quiet sine tone."""
+    frames = int(seconds * rate)
+    samples = (
+        int(3000 * math.sin(2 * math.pi * freq * n / rate)) for n in range(frames)
+    )
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b"".join(struct.pack("<h", s) for s in samples))
+    return buf.getvalue()
+
+
+QUESTIONS = [
+    "What does the document say about the payment schedule?",
+    "Summarize the warranty clause.",
+    "Which section covers equipment maintenance?",
+    "What are the safety training requirements?",
+    "How is revenue growth reported per quarter?",
+    "Who approves the inspection record?",
+    "What is the customer service policy?",
+    "Explain the delivery procedure in two sentences.",
+]
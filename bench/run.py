@@ -0,0 +1,375 @@
+"""
+End-to-end load test — starts the app against a throwaway SQLite database
+and a local fake LLM, replays chat / upload / voice workloads, and reports
+p50/p95/p99 latency, throughput and peak server RSS per endpoint.
+
+    python -m bench.run --users 4 --ask 200 --ask-concurrency 16
+    python -m bench.compare bench/results/old.json bench/results/new.json
+
+Results are written as JSON (default: bench/results/<timestamp>-<commit>.json).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from bench.fake_llm import FakeLLMConfig, start_server
+from bench.fixtures import QUESTIONS, make_pdf, make_wav
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "bench", "results")
+
+
+# ── HTTP helpers (stdlib only) ────────────────────────
+class Client:
+    def __init__(self, base_url: str, timeout: float = 600.0):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.cookie = ""
+
+    def request(self, method: str, path: str, body: bytes | None = None,
+                content_type: str | None = None) -> tuple[int, bytes]:
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        if content_type:
+            req.add_header("Content-Type", content_type)
+        if self.cookie:
+            req.add_header("Cookie", self.cookie)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                set_cookie = resp.headers.get("Set-Cookie")
+                if set_cookie:
+                    self.cookie = set_cookie.split(";", 1)[0]
+                return resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+        except (urllib.error.URLError, OSError) as e:
+            return 0, str(e).encode()
+
+    def post_json(self, path: str, payload: dict) -> tuple[int, bytes]:
+        return self.request("POST", path, json.dumps(payload).encode(), "application/json")
+
+    def post_file(self, path: str, field: str, filename: str, data: bytes,
+                  mime: str) -> tuple[int, bytes]:
+        boundary = uuid.uuid4().hex
+        body = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f"Content-Type: {mime}\r\n\r\n"
+        ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+        return self.request("POST", path, body, f"multipart/form-data; boundary={boundary}")
+
+
+# ── Server process & RSS sampling ─────────────────────
+def _read_rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss // 1024
+    except Exception:
+        return 0
+
+
+class RSSSampler(threading.Thread):
+    """Polls the server's RSS and tracks the peak since the last reset()."""
+
+    def __init__(self, pid: int, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        self._done = threading.Event()
+
+    def reset(self):
+        self.peak_kb = _read_rss_kb(self.pid)
+
+    def run(self):
+        while not self._done.is_set():
+            self.peak_kb = max(self.peak_kb, _read_rss_kb(self.pid))
+            time.sleep(self.interval)
+
+    def stop(self):
+        self._done.set()
+
+
+def _start_app(port: int, env: dict, stub_stt: bool) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "bench.serve", "--port", str(port)]
+    if stub_stt:
+        cmd.append("--stub-stt")
+    return subprocess.Popen(cmd, cwd=ROOT, env=env)
+
+
+def _wait_ready(client: Client, proc: subprocess.Popen, timeout: float):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"App exited during startup (code {proc.returncode})")
+        status, _ = client.request("GET", "/")
+        if status == 200:
+            return
+        time.sleep(0.5)
+    raise RuntimeError(f"App not ready after {timeout:.0f}s")
+
+
+# ── Stats ──────────────────────────────────────────────
+def _percentile(sorted_vals: list[float], q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    pos = (len(sorted_vals) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_vals) - 1)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (pos - lo)
+
+
+def _summarize(latencies: list[float], statuses: list[int], wall: float, peak_kb: int) -> dict:
+    ok = sorted(l for l, s in zip(latencies, statuses) if 200 <= s < 300)
+    return {
+        "requests": len(statuses),
+        "errors": sum(1 for s in statuses if not 200 <= s < 300),
+        "status_counts": {str(s): statuses.count(s) for s in sorted(set(statuses))},
+        "p50_ms": round(_percentile(ok, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(ok, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(ok, 0.99) * 1000, 2),
+        "mean_ms": round(sum(ok) / len(ok) * 1000, 2) if ok else 0.0,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(ok) / wall, 3) if wall > 0 else 0.0,
+        "peak_rss_mb": round(peak_kb / 1024, 1),
+    }
+
+
+def _run_phase(name: str, jobs: list, concurrency: int, sampler: RSSSampler) -> dict:
+    """Run callables returning an HTTP status with bounded concurrency."""
+    latencies: list[float] = []
+    statuses: list[int] = []
+    lock = threading.Lock()
+
+    def timed(job):
+        t0 = time.perf_counter()
+        status = job()
+        elapsed = time.perf_counter() - t0
+        with lock:
+            latencies.append(elapsed)
+            statuses.append(status)
+
+    sampler.reset()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        list(pool.map(timed, jobs))
+    wall = time.perf_counter() - t0
+
+    stats = _summarize(latencies, statuses, wall, sampler.peak_kb)
+    print(
+        f"  {name:<18} n={stats['requests']:<5} err={stats['errors']:<4} "
+        f"p50={stats['p50_ms']:>9.1f}ms p95={stats['p95_ms']:>9.1f}ms "
+        f"p99={stats['p99_ms']:>9.1f}ms  {stats['throughput_rps']:>7.2f} req/s  "
+        f"rss={stats['peak_rss_mb']:.0f}MB"
+    )
+    return stats
+
+
+# ── Workloads ──────────────────────────────────────────
+def _register_users(base_url: str, n: int) -> list[Client]:
+    clients = []
+    tag = uuid.uuid4().hex[:6]
+    for i in range(n):
+        c = Client(base_url)
+        status, body = c.post_json("/api/auth/register", {
+            "username": f"bench_{tag}_{i}",
+            "email": f"bench_{tag}_{i}@example.com",
+            "password": "bench-password",
+        })
+        if status != 200:
+            raise RuntimeError(f"Registration failed ({status}): {body[:200]!r}")
+        clients.append(c)
+    return clients
+
+
+def _upload_jobs(clients: list[Client], n: int, pages: int) -> list:
+    pdfs = [make_pdf(pages=pages, seed=i) for i in range(min(n, 8))]
+
+    def job(i):
+        c = clients[i % len(clients)]
+        return lambda: c.post_file(
+            "/api/pdf/upload", "file", f"doc_{i}.pdf", pdfs[i % len(pdfs)], "application/pdf"
+        )[0]
+
+    return [job(i) for i in range(n)]
+
+
+def _ask_jobs(clients: list[Client], n: int, rng: random.Random) -> list:
+    def job(i):
+        c = clients[i % len(clients)]
+        q = rng.choice(QUESTIONS)
+        return lambda: c.post_json("/api/chat/ask", {"question": q})[0]
+
+    return [job(i) for i in range(n)]
+
+
+def _ask_batch_jobs(clients: list[Client], n: int, size: int, rng: random.Random) -> list:
+    def job(i):
+        c = clients[i % len(clients)]
+        qs = [f"{rng.choice(QUESTIONS)} ({k})" for k in range(size)]
+        return lambda: c.post_json("/api/chat/ask_batch", {"questions": qs})[0]
+
+    return [job(i) for i in range(n)]
+
+
+def _voice_jobs(clients: list[Client], n: int, audio: bytes, filename: str) -> list:
+    def job(i):
+        c = clients[i % len(clients)]
+        return lambda: c.post_file("/api/chat/voice", "file", filename, audio, "audio/wav")[0]
+
+    return [job(i) for i in range(n)]
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, timeout=10,
+        )
+        return out.stdout.strip() or "unknown"
+    except (OSError, subprocess.TimeoutExpired):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark for the AI PDF Voice Assistant")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--uploads", type=int, default=8)
+    parser.add_argument("--upload-concurrency", type=int, default=2)
+    parser.add_argument("--pdf-pages", type=int, default=10)
+    parser.add_argument("--ask", type=int, default=100)
+    parser.add_argument("--ask-concurrency", type=int, default=8)
+    parser.add_argument("--batches", type=int, default=0, help="/api/chat/ask_batch requests")
+    parser.add_argument("--batch-size", type=int, default=20, help="questions per batch")
+    parser.add_argument("--batch-concurrency", type=int, default=2)
+    parser.add_argument("--voice", type=int, default=20)
+    parser.add_argument("--voice-concurrency", type=int, default=4)
+    parser.add_argument("--audio", help="audio file for voice requests (runs real Whisper); "
+                                        "omit to use a synthetic tone and a stubbed transcript")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=40.0)
+    parser.add_argument("--llm-max-tokens", type=int, default=60)
+    parser.add_argument("--llm-no-data-rate", type=float, default=0.2)
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="result JSON path")
+    parser.add_argument("--keep-workdir", action="store_true",
+                        help="keep the temp dir with the database, uploads and TTS files")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    llm_cfg = FakeLLMConfig(
+        latency=args.llm_latency,
+        tokens_per_sec=args.llm_tokens_per_sec,
+        max_tokens=args.llm_max_tokens,
+        no_data_rate=args.llm_no_data_rate,
+        seed=args.seed,
+    )
+    llm_server = start_server(cfg=llm_cfg)
+    llm_url = f"http://127.0.0.1:{llm_server.server_address[1]}/v1"
+
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    env = dict(os.environ)
+    env.pop("RENDER", None)
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    env["UPLOAD_DIR"] = os.path.join(workdir, "uploads")
+    env["BENCH_TTS_DIR"] = os.path.join(workdir, "tts")
+    env["OPENAI_API_BASE"] = llm_url
+    env["OPENAI_API_KEY"] = "bench"
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    print(f"Starting app on {base_url} (LLM stub at {llm_url}, workdir {workdir})")
+    proc = _start_app(args.port, env, stub_stt=not args.audio)
+    sampler = RSSSampler(proc.pid)
+    results: dict = {}
+    try:
+        _wait_ready(Client(base_url), proc, args.startup_timeout)
+        sampler.start()
+        idle_rss_mb = round(_read_rss_kb(proc.pid) / 1024, 1)
+        clients = _register_users(base_url, args.users)
+
+        if args.audio:
+            with open(args.audio, "rb") as f:
+                audio, audio_name = f.read(), os.path.basename(args.audio)
+        else:
+            audio, audio_name = make_wav(), "canned.wav"
+
+        print("Running workloads:")
+        if args.uploads:
+            results["/api/pdf/upload"] = _run_phase(
+                "/api/pdf/upload", _upload_jobs(clients, args.uploads, args.pdf_pages),
+                args.upload_concurrency, sampler,
+            )
+        if args.ask:
+            results["/api/chat/ask"] = _run_phase(
+                "/api/chat/ask", _ask_jobs(clients, args.ask, rng),
+                args.ask_concurrency, sampler,
+            )
+        if args.batches:
+            results["/api/chat/ask_batch"] = _run_phase(
+                "/api/chat/ask_batch", _ask_batch_jobs(clients, args.batches, args.batch_size, rng),
+                args.batch_concurrency, sampler,
+            )
+        if args.voice:
+            results["/api/chat/voice"] = _run_phase(
+                "/api/chat/voice", _voice_jobs(clients, args.voice, audio, audio_name),
+                args.voice_concurrency, sampler,
+            )
+    finally:
+        sampler.stop()
+        proc.terminate()
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        llm_server.shutdown()
+        if args.keep_workdir:
+            print(f"Kept work directory {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    commit = _git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "idle_rss_mb": idle_rss_mb,
+        "llm_requests": llm_cfg.requests,
+        "endpoints": results,
+    }
+
+    out = args.out
+    if not out:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        out = os.path.join(RESULTS_DIR, f"{stamp}-{commit}.json")
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark entry point for the app — same as `uvicorn app:app`, but with
+gTTS swapped for a local stub (no network calls) and, optionally, Whisper
+swapped for a canned transcript.
+
+    python -m bench.serve --port 8765 [--stub-stt]
+
+Configure the database, upload directory and LLM through the usual env
+vars (DATABASE_URL, UPLOAD_DIR, OPENAI_API_BASE) before starting. Stub TTS
+files go to BENCH_TTS_DIR (default: static/).
+"""
+import argparse
+import os
+import sys
+import types
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CANNED_TRANSCRIPT = "What does the document say about the payment schedule?"
+
+
+def _stub_tts() -> types.ModuleType:
+    mod = types.ModuleType("tts")
+
+    out_dir = os.getenv("BENCH_TTS_DIR", "static")
+
+    def text_to_speech(text: str) -> str:
+        os.makedirs(out_dir, exist_ok=True)
+        output_path = os.path.join(out_dir, f"response_{uuid.uuid4().hex}.mp3")
+        with open(output_path, "wb") as f:
+            f.write(b"\xff\xfb\x90\x00" + b"\x00" * 413)  # one silent MPEG frame
+        return output_path
+
+    mod.text_to_speech = text_to_speech
+    return mod
+
+
+def _stub_stt() -> types.ModuleType:
+    mod = types.ModuleType("stt")
+
+    def speech_to_text(audio_path: str) -> str:
+        return CANNED_TRANSCRIPT
+
+    mod.speech_to_text = speech_to_text
+    return mod
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the app with benchmark stubs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--stub-stt", action="store_true",
+                        help="replace Whisper with a canned transcript")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+
+    # Must be registered before `app` imports the routers
+    sys.modules["tts"] = _stub_tts()
+    if args.stub_stt:
+        sys.modules["stt"] = _stub_stt()
+
+    import uvicorn
+    from app import app
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
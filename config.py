@@ -8,9 +8,9 @@ from urllib.parse import quote_plus
 
 # ── Paths ──────────────────────────────────────────────
 BASE_DIR = Path(__file__).resolve().parent
-UPLOAD_DIR = BASE_DIR / "uploads"
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", str(BASE_DIR / "uploads")))
 STATIC_DIR = BASE_DIR / "static"
-UPLOAD_DIR.mkdir(exist_ok=True)
+UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 STATIC_DIR.mkdir(exist_ok=True)
 
 # ── Database ───────────────────────────────────────────
@@ -40,10 +40,48 @@ LLM_API_KEY = os.getenv("OPENAI_API_KEY", "lm-studio")
 LLM_MODEL = os.getenv("LLM_MODEL", "tinyllama-1.1b-chat-v1.0")
 LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.7"))
 
+# ── Batch questions (/api/chat/ask_batch) ─────────────
+ASK_BATCH_MAX_QUESTIONS = int(os.getenv("ASK_BATCH_MAX_QUESTIONS", "200"))
+ASK_BATCH_CONCURRENCY = int(os.getenv("ASK_BATCH_CONCURRENCY", "4"))   # parallel LLM calls
+
 # ── Embeddings ─────────────────────────────────────────
 EMBEDDING_MODEL = os.getenv(
     "EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
 )
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))        # chunks per encode call
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0"))               # 0 = library default
+EMBED_NORMALIZE = os.getenv("EMBED_NORMALIZE", "false").lower() in ("1", "true", "yes")
+EMBED_QUEUE_DEPTH = int(os.getenv("EMBED_QUEUE_DEPTH", "4"))       # split→encode batches in flight
+if EMBED_THREADS > 0:
+    # BLAS / OpenMP pools are sized when numpy / torch / faiss load — set before they import
+    for _var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ.setdefault(_var, str(EMBED_THREADS))
 
 # ── Whisper STT ────────────────────────────────────────
 WHISPER_MODEL = os.getenv("WHISPER_MODEL", "small")
+
+# ── Metrics / instrumentation ──────────────────────────
+# Per-stage timing histograms on /metrics and Server-Timing response headers
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# ── LLM work scheduler ─────────────────────────────────
+# Admission control in front of get_answer / build_retriever: global and
+# per-user concurrency caps, per-user token buckets, round-robin queueing.
+SCHED_ENABLED = os.getenv("SCHED_ENABLED", "true").lower() in ("1", "true", "yes")
+SCHED_MAX_CONCURRENCY = int(os.getenv("SCHED_MAX_CONCURRENCY", "2"))
+SCHED_PER_USER_CONCURRENCY = int(os.getenv("SCHED_PER_USER_CONCURRENCY", "1"))
+SCHED_CHAT_RATE = float(os.getenv("SCHED_CHAT_RATE", "1.0"))        # requests / sec
+SCHED_CHAT_BURST = int(os.getenv("SCHED_CHAT_BURST", "5"))
+SCHED_INGEST_RATE = float(os.getenv("SCHED_INGEST_RATE", "0.2"))    # rebuilds / sec
+SCHED_INGEST_BURST = int(os.getenv("SCHED_INGEST_BURST", "3"))
+SCHED_MAX_QUEUE = int(os.getenv("SCHED_MAX_QUEUE", "32"))
+SCHED_MAX_QUEUE_PER_USER = int(os.getenv("SCHED_MAX_QUEUE_PER_USER", "4"))  # per class
+SCHED_QUEUE_TIMEOUT = float(os.getenv("SCHED_QUEUE_TIMEOUT", "30"))  # seconds
+# Ingest work waiting this long jumps ahead of chat, so uploads can't starve
+SCHED_INGEST_PROMOTE_AFTER = float(os.getenv("SCHED_INGEST_PROMOTE_AFTER", "5"))  # seconds
+# Batch questions (/api/chat/ask_batch): own class between chat and ingest,
+# with its own per-user cap and a per-question token bucket
+SCHED_BATCH_PER_USER_CONCURRENCY = int(os.getenv("SCHED_BATCH_PER_USER_CONCURRENCY", "4"))
+SCHED_BATCH_RATE = float(os.getenv("SCHED_BATCH_RATE", "2.0"))     # questions / sec
+SCHED_BATCH_BURST = int(os.getenv("SCHED_BATCH_BURST", "200"))
+SCHED_BATCH_PROMOTE_AFTER = float(os.getenv("SCHED_BATCH_PROMOTE_AFTER", "10"))  # seconds
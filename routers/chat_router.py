@@ -2,15 +2,19 @@
 Chat router — text chat, voice chat, session management, and chat history.
 """
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-import shutil, uuid, os
+import json, shutil, uuid, os
 from typing import Optional
 
-from database import get_db
+from config import ASK_BATCH_MAX_QUESTIONS
+from database import get_db, SessionLocal
 from models import User, ChatSession, Message
 from auth import get_current_user
-from services.llm_service import get_answer
+from services.llm_service import get_answer, get_answers
+from services.metrics import span
 from stt import speech_to_text
 from tts import text_to_speech
 
@@ -22,6 +26,10 @@ class AskRequest(BaseModel):
     question: str
     session_id: int | None = None
 
+class AskBatchRequest(BaseModel):
+    questions: list[str]
+    session_id: int | None = None
+
 class SessionCreate(BaseModel):
     title: str = "New Chat"
 
@@ -107,7 +115,8 @@ def _ensure_session(session_id: int | None, user: User, db: Session, title: str
 # ── Text chat ──────────────────────────────────────────
 @router.post("/ask")
 def ask(req: AskRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    session = _ensure_session(req.session_id, user, db, title=req.question[:60])
+    with span("db"):
+        session = _ensure_session(req.session_id, user, db, title=req.question[:60])
 
     # Save user message
     user_msg = Message(session_id=session.id, role="user", content=req.question)
@@ -116,9 +125,10 @@ def ask(req: AskRequest, user: User = Depends(get_current_user), db: Session = D
     answer, source = get_answer(req.question, user.id)
 
     # Save AI message
-    ai_msg = Message(session_id=session.id, role="ai", content=answer, source=source)
-    db.add(ai_msg)
-    db.commit()
+    with span("db"):
+        ai_msg = Message(session_id=session.id, role="ai", content=answer, source=source)
+        db.add(ai_msg)
+        db.commit()
 
     return {
         "answer": answer,
@@ -127,6 +137,79 @@ def ask(req: AskRequest, user: User = Depends(get_current_user), db: Session = D
     }
 
 
+# ── Batch questions ────────────────────────────────────
+@router.post("/ask_batch")
+def ask_batch(req: AskBatchRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """
+    Answer a list of questions in one request. Streams NDJSON: one line per
+    answer as it finishes (in completion order, tagged with its index in the
+    request's list; blank entries get no line), then a final summary line.
+    Answered pairs are saved with one bulk insert when the stream ends —
+    including when the client disconnects early.
+    """
+    # Blank entries are skipped, but lines keep the client's original index
+    positions = [i for i, q in enumerate(req.questions) if q.strip()]
+    questions = [req.questions[i].strip() for i in positions]
+    if not questions:
+        raise HTTPException(status_code=400, detail="No questions provided")
+    if len(questions) > ASK_BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {ASK_BATCH_MAX_QUESTIONS} questions per batch")
+
+    # Admission and shared retrieval run here, so a shed batch gets a plain 429
+    outcomes = get_answers(questions, user.id)
+
+    with span("db"):
+        session = _ensure_session(req.session_id, user, db, title=questions[0][:60])
+    session_id = session.id
+
+    def save(answers: list[tuple[str, str] | None]):
+        rows = []
+        for question, outcome in zip(questions, answers):
+            if outcome is None:
+                continue
+            rows.append({"session_id": session_id, "role": "user", "content": question, "source": "general"})
+            rows.append({"session_id": session_id, "role": "ai", "content": outcome[0], "source": outcome[1]})
+        if not rows:
+            return
+        # The request's session may already be closed once streaming starts
+        with span("db"):
+            bulk_db = SessionLocal()
+            try:
+                bulk_db.execute(insert(Message), rows)
+                bulk_db.commit()
+            finally:
+                bulk_db.close()
+
+    def stream():
+        answers: list[tuple[str, str] | None] = [None] * len(questions)
+        failed = 0
+        try:
+            for i, outcome in outcomes:
+                if isinstance(outcome, Exception):
+                    failed += 1
+                    status = outcome.status_code if isinstance(outcome, HTTPException) else 500
+                    detail = outcome.detail if isinstance(outcome, HTTPException) else f"Generation error: {outcome}"
+                    line = {"index": positions[i], "question": questions[i], "error": detail, "status": status}
+                else:
+                    answers[i] = outcome
+                    answer, source = outcome
+                    line = {"index": positions[i], "question": questions[i], "answer": answer, "source": source}
+                yield json.dumps(line) + "\n"
+        finally:
+            # Runs on early close too (client gone), so finished answers are kept
+            outcomes.close()
+            save(answers)
+
+        yield json.dumps({
+            "done": True,
+            "session_id": session_id,
+            "answered": len(questions) - failed,
+            "failed": failed,
+        }) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 # ── Voice chat ─────────────────────────────────────────
 @router.post("/voice")
 def voice_chat(
@@ -136,7 +219,7 @@ def voice_chat(
     db: Session = Depends(get_db),
 ):
     audio_path = f"input_{uuid.uuid4().hex}.webm"
-    with open(audio_path, "wb") as buffer:
+    with span("upload_save"), open(audio_path, "wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
 
     try:
@@ -144,7 +227,8 @@ def voice_chat(
         if not question:
             raise HTTPException(status_code=400, detail="Could not understand audio. Please speak clearly and try again.")
         answer, source = get_answer(question, user.id)
-        audio_file = text_to_speech(answer)
+        with span("tts"):
+            audio_file = text_to_speech(answer)
     except HTTPException:
         raise
     except Exception as e:
@@ -153,18 +237,19 @@ def voice_chat(
         if os.path.exists(audio_path):
             os.remove(audio_path)
 
-    session = _ensure_session(session_id, user, db, title=question[:60])
+    with span("db"):
+        session = _ensure_session(session_id, user, db, title=question[:60])
 
-    # Save messages
-    user_msg = Message(session_id=session.id, role="user", content=question, is_voice=True)
-    db.add(user_msg)
+        # Save messages
+        user_msg = Message(session_id=session.id, role="user", content=question, is_voice=True)
+        db.add(user_msg)
 
-    ai_msg = Message(
-        session_id=session.id, role="ai", content=answer,
-        audio_url=audio_file, source=source,
-    )
-    db.add(ai_msg)
-    db.commit()
+        ai_msg = Message(
+            session_id=session.id, role="ai", content=answer,
+            audio_url=audio_file, source=source,
+        )
+        db.add(ai_msg)
+        db.commit()
 
     return {
         "question": question,
@@ -1,17 +1,23 @@
 """
 PDF router — upload, list, and delete PDF documents (per-user).
 """
+import logging
 import os
 import uuid
 
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from database import get_db
+from database import get_db, SessionLocal
 from models import User, PDFDocument
 from auth import get_current_user
 from config import UPLOAD_DIR
-from services.llm_service import build_retriever
+from services.llm_service import build_retriever, invalidate_retriever
+from services.scheduler import Overloaded, scheduler, INGEST
+from services.metrics import span
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/pdf", tags=["pdf"])
 
@@ -22,6 +28,35 @@ def _user_pdf_paths(user_id: int, db: Session) -> list[str]:
     return [str(UPLOAD_DIR / p.filename) for p in pdfs]
 
 
+def _reindex(user_id: int, charge: bool = False):
+    """
+    Rebuild the user's index. PDF paths are read when the build starts
+    (in a fresh session), so coalesced rebuilds see every committed upload.
+    Not rate limited by default: uploads take their ingest token on admission.
+    """
+    def resolve_paths() -> list[str]:
+        db = SessionLocal()
+        try:
+            return _user_pdf_paths(user_id, db)
+        finally:
+            db.close()
+
+    build_retriever(user_id, resolve_paths, charge=charge)
+
+
+def _reindex_after_removal(user_id: int, action: str):
+    """
+    Rebuild after a PDF was removed. Not rate limited (the index only
+    shrinks); if it is still shed, drop the index rather than keep serving
+    the removed PDF, which an earlier coalesced build may have picked up.
+    """
+    try:
+        _reindex(user_id)
+    except Overloaded:
+        logger.warning("Rebuild after %s shed for user %s; index dropped", action, user_id)
+        invalidate_retriever(user_id)
+
+
 @router.post("/upload")
 async def upload_pdf(
     file: UploadFile = File(...),
@@ -31,29 +66,45 @@ async def upload_pdf(
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
 
+    # Shed over-rate uploads before doing any work on the file
+    scheduler.charge(user.id, INGEST)
+
     stored_name = f"{uuid.uuid4().hex}.pdf"
     dest = UPLOAD_DIR / stored_name
 
-    content = await file.read()
-    with open(dest, "wb") as f:
-        f.write(content)
+    with span("upload_save"):
+        content = await file.read()
+        with open(dest, "wb") as f:
+            f.write(content)
 
     # Count pages
     from langchain_community.document_loaders import PDFPlumberLoader
-    pages = len(PDFPlumberLoader(str(dest)).load())
-
-    pdf_doc = PDFDocument(
-        user_id=user.id,
-        filename=stored_name,
-        original_name=file.filename,
-        page_count=pages,
-    )
-    db.add(pdf_doc)
-    db.commit()
-    db.refresh(pdf_doc)
-
-    # Rebuild retriever with all user PDFs
-    build_retriever(user.id, _user_pdf_paths(user.id, db))
+    with span("pdf_load"):
+        pages = len(PDFPlumberLoader(str(dest)).load())
+
+    with span("db"):
+        pdf_doc = PDFDocument(
+            user_id=user.id,
+            filename=stored_name,
+            original_name=file.filename,
+            page_count=pages,
+        )
+        db.add(pdf_doc)
+        db.commit()
+        db.refresh(pdf_doc)
+
+    # Rebuild retriever with all user PDFs (off the event loop — may queue)
+    try:
+        await run_in_threadpool(_reindex, user.id)
+    except Overloaded:
+        # Undo the upload so a retry doesn't duplicate it. A build queued
+        # earlier may already have indexed the file, so rebuild without it.
+        db.delete(pdf_doc)
+        db.commit()
+        if dest.exists():
+            os.remove(dest)
+        await run_in_threadpool(_reindex_after_removal, user.id, "rolled-back upload")
+        raise
 
     return {
         "id": pdf_doc.id,
@@ -98,7 +149,7 @@ def delete_pdf(pdf_id: int, user: User = Depends(get_current_user), db: Session
     db.delete(pdf)
     db.commit()
 
-    # Rebuild retriever without deleted PDF
-    build_retriever(user.id, _user_pdf_paths(user.id, db))
+    # Rebuild retriever without deleted PDF — the delete itself has already succeeded
+    _reindex_after_removal(user.id, "delete")
 
     return {"ok": True}
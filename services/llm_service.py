@@ -1,21 +1,36 @@
 """
 LLM & RAG service — per-user retriever management and answer generation.
 """
+import contextvars
 import os
-from typing import Dict, List, Optional
+import queue
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List, Optional, Union
+
+import faiss
+import numpy as np
+import pdfplumber
+from sentence_transformers import SentenceTransformer
 
 from langchain_openai import ChatOpenAI
-from langchain_community.document_loaders import PDFPlumberLoader
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 
 from config import (
-    LLM_BASE_URL, LLM_API_KEY, LLM_MODEL, LLM_TEMPERATURE, EMBEDDING_MODEL
+    LLM_BASE_URL, LLM_API_KEY, LLM_MODEL, LLM_TEMPERATURE, EMBEDDING_MODEL,
+    EMBED_BATCH_SIZE, EMBED_THREADS, EMBED_NORMALIZE, EMBED_QUEUE_DEPTH,
+    ASK_BATCH_CONCURRENCY, SCHED_ENABLED,
 )
+from services.metrics import span
+from services.scheduler import scheduler, CHAT, BATCH, INGEST
+from services.singleflight import LatestRebuild, SingleFlight
 
 # ── Initialize LLM & embeddings (once) ────────────────
 llm = ChatOpenAI(
@@ -25,63 +40,357 @@ llm = ChatOpenAI(
     openai_api_key=LLM_API_KEY,
 )
 
-embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+_encoder = SentenceTransformer(EMBEDDING_MODEL)
+
+_rag_prompt = ChatPromptTemplate.from_template("""
+    Use ONLY the PDF context to answer.
+    If answer not present, reply exactly: NO_DATA
+
+    Context:
+    {context}
+
+    Question:
+    {question}
+    """)
+_rag_chain = _rag_prompt | llm | StrOutputParser()
+
+
+# ── Embedding pipeline ────────────────────────────────
+def set_embedding_threads(n: int):
+    """Size the torch intra-op and FAISS OpenMP thread pools (0 keeps library defaults)."""
+    if n <= 0:
+        return
+    try:
+        import torch
+        torch.set_num_threads(n)
+    except ImportError:
+        pass
+    faiss.omp_set_num_threads(n)
+
+
+set_embedding_threads(EMBED_THREADS)
+
+
+def _encode(texts: List[str], batch_size: int = EMBED_BATCH_SIZE,
+            normalize: bool = EMBED_NORMALIZE) -> np.ndarray:
+    """Encode texts straight to a float32 matrix, skipping the list-of-floats round trip."""
+    texts = [t.replace("\n", " ") for t in texts]  # same preprocessing as HuggingFaceEmbeddings
+    vectors = _encoder.encode(
+        texts,
+        batch_size=batch_size,
+        normalize_embeddings=normalize,
+        convert_to_numpy=True,
+        show_progress_bar=False,
+    )
+    return np.asarray(vectors, dtype=np.float32)
+
+
+class SentenceEmbeddings(Embeddings):
+    """LangChain view of _encode, so retriever.invoke and the batch paths encode alike."""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return _encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return _encode([text])[0].tolist()
+
+
+embeddings = SentenceEmbeddings()
+
+
+def _iter_pdf_pages(path: str) -> Iterator[Document]:
+    """Yield a PDF's pages one at a time, shaped like PDFPlumberLoader's documents."""
+    with pdfplumber.open(path) as pdf:
+        info = {k: v for k, v in pdf.metadata.items() if type(v) in (str, int)}
+        total = len(pdf.pages)
+        for page in pdf.pages:
+            text = page.extract_text()
+            page.close()  # drop pdfplumber's cached layout objects for this page
+            yield Document(
+                page_content=text + "\n",
+                metadata={"source": path, "file_path": path, "page": page.page_number - 1,
+                          "total_pages": total, **info},
+            )
+
+
+def _iter_chunk_batches(pdf_paths: List[str], splitter, batch_size: int) -> Iterator[List[Document]]:
+    """Load and split PDFs page by page, yielding chunks in batches of batch_size."""
+    batch: List[Document] = []
+    for path in pdf_paths:
+        if not os.path.exists(path):
+            continue
+        pages = _iter_pdf_pages(path)
+        while True:
+            with span("pdf_load"):
+                page = next(pages, None)
+            if page is None:
+                break
+            with span("split"):
+                chunks = splitter.split_documents([page])
+            for chunk in chunks:
+                batch.append(chunk)
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+    if batch:
+        yield batch
+
+
+_DONE = object()
+
+
+def embed_chunks(
+    pdf_paths: List[str],
+    splitter,
+    batch_size: int = EMBED_BATCH_SIZE,
+    normalize: bool = EMBED_NORMALIZE,
+    queue_depth: int = EMBED_QUEUE_DEPTH,
+) -> tuple[List[Document], np.ndarray]:
+    """
+    Split and encode PDFs into (chunks, float32 matrix with one row per chunk).
+    A producer thread parses and splits pages while this thread encodes the
+    previous batch, so PDF parsing overlaps with the encoder. Rows are written
+    into a preallocated matrix that grows geometrically.
+    """
+    batches: queue.Queue = queue.Queue(maxsize=max(1, queue_depth))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for batch in _iter_chunk_batches(pdf_paths, splitter, batch_size):
+                if not put(batch):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(e)
+
+    # Copy the request context so pdf_load / split still land in Server-Timing
+    producer = threading.Thread(target=contextvars.copy_context().run, args=(produce,), daemon=True)
+    producer.start()
+
+    docs: List[Document] = []
+    matrix: Optional[np.ndarray] = None
+    n = 0
+    try:
+        while True:
+            item = batches.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            with span("embed"):
+                vectors = _encode([d.page_content for d in item], batch_size, normalize)
+            rows = len(vectors)
+            if matrix is None:
+                matrix = np.empty((max(rows, batch_size) * 8, vectors.shape[1]), dtype=np.float32)
+            elif n + rows > len(matrix):
+                grown = np.empty((max(2 * len(matrix), n + rows), matrix.shape[1]), dtype=np.float32)
+                grown[:n] = matrix[:n]
+                matrix = grown
+            matrix[n:n + rows] = vectors
+            n += rows
+            docs.extend(item)
+    finally:
+        stop.set()
+        producer.join()
+
+    if matrix is None:
+        return [], np.empty((0, 0), dtype=np.float32)
+    return docs, matrix[:n]
+
+
+def _faiss_from_matrix(docs: List[Document], matrix: np.ndarray) -> FAISS:
+    """Build a FAISS store from precomputed vectors with a single bulk index.add."""
+    index = faiss.IndexFlatL2(matrix.shape[1])
+    index.add(matrix)
+    ids = [str(uuid.uuid4()) for _ in docs]
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore(dict(zip(ids, docs))),
+        index_to_docstore_id=dict(enumerate(ids)),
+        normalize_L2=EMBED_NORMALIZE,  # normalize queries to match the stored vectors
+    )
 
 # ── Per-user retriever cache ──────────────────────────
+# Retriever and corpus version are swapped together under _state_lock;
+# the version bumps on every rebuild and keys the answer single-flight.
+_state_lock = threading.Lock()
 _user_retrievers: Dict[int, object] = {}
+_corpus_versions: Dict[int, int] = {}
 
+# Rebuilds are serialized per user and coalesced: queued callers whose
+# request is covered by a newer build return without rebuilding.
+_rebuilds = LatestRebuild("rebuild")
+_answers = SingleFlight("answer")
 
-def build_retriever(user_id: int, pdf_paths: List[str]):
+
+def build_retriever(user_id: int, pdf_paths: Union[List[str], Callable[[], List[str]]],
+                    charge: bool = True):
     """
     (Re)build the FAISS retriever for a user from their PDF files.
-    Called after upload or delete.
+    Called after upload or delete. Runs in an ingestion scheduler slot;
+    raises scheduler.Overloaded (429) when shed. Pass charge=False when the
+    caller already took the ingest token (or the rebuild must not be rate limited).
+
+    pdf_paths may be a callable, resolved when the build actually starts, so
+    a coalesced build always indexes the user's latest set of PDFs.
     """
-    all_chunks = []
-    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=200)
+    def build(latest_paths):
+        with scheduler.slot(user_id, INGEST, charge=charge):
+            paths = latest_paths() if callable(latest_paths) else latest_paths
+            retriever = _build_retriever(paths)
 
-    for path in pdf_paths:
-        if os.path.exists(path):
-            docs = PDFPlumberLoader(path).load()
-            all_chunks.extend(splitter.split_documents(docs))
-
-    if all_chunks:
-        vs = FAISS.from_documents(all_chunks, embeddings)
-        _user_retrievers[user_id] = vs.as_retriever(search_kwargs={"k": 3})
-    else:
+        with _state_lock:
+            if retriever is not None:
+                _user_retrievers[user_id] = retriever
+            else:
+                _user_retrievers.pop(user_id, None)
+            _corpus_versions[user_id] = _corpus_versions.get(user_id, 0) + 1
+
+    _rebuilds.request(user_id, pdf_paths, build)
+
+
+def invalidate_retriever(user_id: int):
+    """Drop a user's index (e.g. when a rebuild after delete was shed) so stale chunks aren't served."""
+    with _state_lock:
         _user_retrievers.pop(user_id, None)
+        _corpus_versions[user_id] = _corpus_versions.get(user_id, 0) + 1
+
+
+def _build_retriever(pdf_paths: List[str]):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=200)
+    docs, matrix = embed_chunks(pdf_paths, splitter)
+
+    if not docs:
+        return None
+    with span("index"):
+        vs = _faiss_from_matrix(docs, matrix)
+    return vs.as_retriever(search_kwargs={"k": 3})
+
+
+def _normalize_question(question: str) -> str:
+    return " ".join(question.casefold().split()).rstrip("?!. ")
 
 
 def get_answer(question: str, user_id: int) -> tuple[str, str]:
     """
     Answer a question using RAG (if PDF indexed) or direct LLM.
     Returns (answer_text, source) where source is "pdf" or "general".
+    Runs in a chat scheduler slot; raises scheduler.Overloaded (429) when shed.
+    Identical concurrent questions against the same corpus share one answer.
     """
-    retriever = _user_retrievers.get(user_id)
+    with _state_lock:
+        retriever = _user_retrievers.get(user_id)
+        version = _corpus_versions.get(user_id, 0)
 
-    if retriever is None:
-        return llm.invoke(question).content, "general"
+    def generate():
+        with scheduler.slot(user_id, CHAT):
+            return _generate_answer(question, retriever)
 
-    prompt = ChatPromptTemplate.from_template("""
-    Use ONLY the PDF context to answer.
-    If answer not present, reply exactly: NO_DATA
+    return _answers.do((user_id, _normalize_question(question), version), generate)
 
-    Context:
-    {context}
 
-    Question:
-    {question}
-    """)
+def get_answers(questions: List[str], user_id: int) -> Iterator[tuple[int, object]]:
+    """
+    Answer a batch of questions against one corpus snapshot.
+    Admission and retrieval happen up front, so a shed batch raises
+    scheduler.Overloaded (429) before anything is streamed: the batch is
+    charged one batch-class token per unique question, then all questions are
+    embedded in one call and searched with one FAISS query. Returns an
+    iterator that fans generation out to the LLM with bounded concurrency and
+    yields (index, (answer, source)) as each answer finishes, or
+    (index, exception) if that question failed. Closing the iterator early
+    cancels generations that haven't started.
+    """
+    # Duplicate questions in a batch share one generation
+    keys = [_normalize_question(q) for q in questions]
+    groups: Dict[str, List[int]] = {}
+    for i, key in enumerate(keys):
+        groups.setdefault(key, []).append(i)
+    unique = [indices[0] for indices in groups.values()]
+
+    scheduler.charge(user_id, BATCH, tokens=len(unique))
+
+    with _state_lock:
+        retriever = _user_retrievers.get(user_id)
+        version = _corpus_versions.get(user_id, 0)
+
+    contexts: Dict[int, list] = {}
+    if retriever is not None:
+        docs = _retrieve_batch(retriever, [questions[i] for i in unique])
+        contexts = dict(zip(unique, docs))
+
+    def generate(i: int):
+        def run():
+            with scheduler.slot(user_id, BATCH, charge=False):
+                if retriever is None:
+                    with span("llm"):
+                        return llm.invoke(questions[i]).content, "general"
+                return _answer_from_context(questions[i], contexts[i])
+        return _answers.do((user_id, keys[i], version), run)
+
+    workers = ASK_BATCH_CONCURRENCY
+    if SCHED_ENABLED:
+        workers = scheduler.max_fanout(BATCH, workers)
+
+    def results():
+        pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        try:
+            futures = {pool.submit(generate, i): i for i in unique}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    outcome = e
+                for j in groups[keys[i]]:
+                    yield j, outcome
+        finally:
+            # Don't wait on generations nobody will read if the stream is closed early
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    return results()
+
+
+def _retrieve_batch(retriever, questions: List[str]) -> List[list]:
+    """Top-k documents per question with one embedding call and one index search."""
+    vs = retriever.vectorstore
+    k = retriever.search_kwargs.get("k", 4)
+    with span("retrieval"):
+        vectors = _encode(questions)
+        _, ids = vs.index.search(vectors, k)
+    return [
+        [vs.docstore.search(vs.index_to_docstore_id[j]) for j in row if j != -1]
+        for row in ids
+    ]
+
+
+def _generate_answer(question: str, retriever) -> tuple[str, str]:
+    if retriever is None:
+        with span("llm"):
+            return llm.invoke(question).content, "general"
+
+    with span("retrieval"):
+        context = retriever.invoke(question)
+    return _answer_from_context(question, context)
 
-    chain = (
-        {"context": retriever, "question": RunnablePassthrough()}
-        | prompt
-        | llm
-        | StrOutputParser()
-    )
 
-    answer = chain.invoke(question)
+def _answer_from_context(question: str, context: list) -> tuple[str, str]:
+    with span("llm"):
+        answer = _rag_chain.invoke({"context": context, "question": question})
 
     if "NO_DATA" in answer:
-        return llm.invoke(question).content, "general"
+        with span("llm"):
+            return llm.invoke(question).content, "general"
 
     return answer, "pdf"
@@ -0,0 +1,147 @@
+"""
+Per-stage latency instrumentation — in-process histograms exposed in
+Prometheus text format, plus per-request stage timings for Server-Timing.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from config import METRICS_ENABLED
+
+# Seconds — covers fast DB calls up to slow Whisper / LLM stages
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram keyed by a single label value."""
+
+    def __init__(self, name: str, help_text: str, label: str, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # label value → [bucket counts..., +Inf count], sum
+        self._counts: Dict[str, list[int]] = {}
+        self._sums: Dict[str, float] = {}
+
+    def observe(self, label_value: str, seconds: float):
+        idx = bisect_left(self.buckets, seconds)
+        with self._lock:
+            counts = self._counts.get(label_value)
+            if counts is None:
+                counts = self._counts[label_value] = [0] * (len(self.buckets) + 1)
+                self._sums[label_value] = 0.0
+            counts[idx] += 1
+            self._sums[label_value] += seconds
+
+    def render(self) -> list[str]:
+        with self._lock:
+            snapshot = {k: (list(v), self._sums[k]) for k, v in self._counts.items()}
+
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for value, (counts, total) in sorted(snapshot.items()):
+            label = f'{self.label}="{_escape(value)}"'
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {total}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by a single label value."""
+
+    def __init__(self, name: str, help_text: str, label: str):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._lock = threading.Lock()
+        self._values: Dict[str, int] = {}
+
+    def inc(self, label_value: str, amount: int = 1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            snapshot = dict(self._values)
+
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for value, n in sorted(snapshot.items()):
+            lines.append(f'{self.name}{{{self.label}="{_escape(value)}"}} {n}')
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# ── Registry ──────────────────────────────────────────
+stage_duration = Histogram(
+    "app_stage_duration_seconds", "Time spent in each request processing stage.", "stage"
+)
+request_duration = Histogram(
+    "app_http_request_duration_seconds", "End-to-end HTTP request latency by route.", "route"
+)
+_registry = [stage_duration, request_duration]
+
+
+def register(metric):
+    """Add a Histogram or Counter to the /metrics output."""
+    _registry.append(metric)
+    return metric
+
+
+def render_metrics() -> str:
+    lines: list[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ── Per-request stage timings (for Server-Timing) ─────
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+def start_request() -> Dict[str, float]:
+    """Begin collecting stage timings for the current request context."""
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def record(stage: str, seconds: float):
+    """Record a stage duration in the histogram and the current request."""
+    if not METRICS_ENABLED:
+        return
+    stage_duration.observe(stage, seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def span(stage: str):
+    """Time the enclosed block as `stage`. No-op when metrics are disabled."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - t0)
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
@@ -0,0 +1,289 @@
+"""
+Fair scheduler for LLM work — admission control in front of answer
+generation and index rebuilds.
+
+Each unit of work must hold a slot. Slots are bounded globally and per
+user and class; waiting requests are queued per user and granted
+round-robin across users, with interactive chat dispatched before batch
+questions and ingestion — unless lower-priority work has waited longer than
+its promotion age. Requests over a user's token-bucket rate, or arriving
+when the queue is full, are shed with 429 + Retry-After. The per-user queue
+cap is also counted per class, so a user's own batch can't crowd out their
+chat or uploads.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Deque, Dict
+
+from fastapi import HTTPException, status
+
+from config import (
+    SCHED_ENABLED, SCHED_MAX_CONCURRENCY, SCHED_PER_USER_CONCURRENCY,
+    SCHED_CHAT_RATE, SCHED_CHAT_BURST, SCHED_INGEST_RATE, SCHED_INGEST_BURST,
+    SCHED_MAX_QUEUE, SCHED_MAX_QUEUE_PER_USER, SCHED_QUEUE_TIMEOUT,
+    SCHED_INGEST_PROMOTE_AFTER, SCHED_BATCH_PER_USER_CONCURRENCY,
+    SCHED_BATCH_RATE, SCHED_BATCH_BURST, SCHED_BATCH_PROMOTE_AFTER,
+)
+from services import metrics
+
+# Priority classes, highest first
+CHAT = "chat"
+BATCH = "batch"
+INGEST = "ingest"
+PRIORITIES = (CHAT, BATCH, INGEST)
+MAX_RETRY_AFTER = 3600  # seconds; caps the hint when a bucket never refills
+
+queue_wait = metrics.register(metrics.Histogram(
+    "app_scheduler_queue_wait_seconds", "Time spent waiting for an LLM work slot.", "priority"
+))
+rejected = metrics.register(metrics.Counter(
+    "app_scheduler_rejected_total", "Requests shed by the LLM work scheduler.", "reason"
+))
+
+
+class Overloaded(HTTPException):
+    """429 raised when a request is shed; carries a Retry-After hint."""
+
+    def __init__(self, detail: str, retry_after: float):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(min(retry_after, MAX_RETRY_AFTER))))},
+        )
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_consume(self, n: int = 1) -> float:
+        """Take n tokens. Returns 0 on success, else seconds until they are available."""
+        now = time.monotonic()
+        self._refill(now)
+        if self.tokens >= n:
+            self.tokens -= n
+            return 0.0
+        if self.rate <= 0 or n > self.capacity:
+            return float("inf")
+        return (n - self.tokens) / self.rate
+
+
+class _Ticket:
+    __slots__ = ("user_id", "priority", "granted", "enqueued")
+
+    def __init__(self, user_id: int, priority: str):
+        self.user_id = user_id
+        self.priority = priority
+        self.granted = False
+        self.enqueued = time.monotonic()
+
+
+class FairScheduler:
+    def __init__(
+        self,
+        max_concurrency: int = SCHED_MAX_CONCURRENCY,
+        per_user_concurrency: int = SCHED_PER_USER_CONCURRENCY,
+        per_user_limits: Dict[str, int] | None = None,
+        rates: Dict[str, tuple[float, int]] | None = None,
+        max_queue: int = SCHED_MAX_QUEUE,
+        max_queue_per_user: int = SCHED_MAX_QUEUE_PER_USER,
+        queue_timeout: float = SCHED_QUEUE_TIMEOUT,
+        promote_after: Dict[str, float] | None = None,
+    ):
+        self.max_concurrency = max_concurrency
+        # per-user slot cap for each class (running work is counted per class)
+        self.per_user_limits = {p: per_user_concurrency for p in PRIORITIES}
+        self.per_user_limits.update(per_user_limits if per_user_limits is not None else {
+            BATCH: SCHED_BATCH_PER_USER_CONCURRENCY,
+        })
+        self.rates = rates or {
+            CHAT: (SCHED_CHAT_RATE, SCHED_CHAT_BURST),
+            BATCH: (SCHED_BATCH_RATE, SCHED_BATCH_BURST),
+            INGEST: (SCHED_INGEST_RATE, SCHED_INGEST_BURST),
+        }
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.queue_timeout = queue_timeout
+        # priority → age (s) after which its waiting work is served first
+        self.promote_after = promote_after if promote_after is not None else {
+            INGEST: SCHED_INGEST_PROMOTE_AFTER,
+            BATCH: SCHED_BATCH_PROMOTE_AFTER,
+        }
+
+        self._cond = threading.Condition()
+        self._running = 0
+        self._user_running: Dict[tuple[int, str], int] = {}  # (user, priority) → running
+        # priority → user_id → waiting tickets; dict order is the round-robin order
+        self._queues: Dict[str, "OrderedDict[int, Deque[_Ticket]]"] = {
+            p: OrderedDict() for p in PRIORITIES
+        }
+        self._queued = 0
+        self._user_queued: Dict[tuple[int, str], int] = {}  # (user, priority) → waiting
+        self._buckets: Dict[tuple[int, str], TokenBucket] = {}
+        self._avg_service = 1.0  # EWMA of slot hold time, for Retry-After hints
+
+    # ── Admission ──────────────────────────────────────
+    def _retry_hint(self) -> float:
+        return self._avg_service * (self._queued + 1) / max(1, self.max_concurrency)
+
+    def _reject(self, reason: str, detail: str, retry_after: float):
+        rejected.inc(reason)
+        raise Overloaded(detail, retry_after)
+
+    def _consume_token(self, user_id: int, priority: str, tokens: int = 1):
+        """Charge the user's token bucket. Caller holds the lock."""
+        bucket = self._buckets.get((user_id, priority))
+        if bucket is None:
+            rate, burst = self.rates[priority]
+            bucket = self._buckets[(user_id, priority)] = TokenBucket(rate, burst)
+        wait = bucket.try_consume(tokens)
+        if wait:
+            self._reject("rate_limited", "Rate limit exceeded", wait)
+
+    def _admit(self, user_id: int, priority: str, charge: bool) -> _Ticket:
+        """Check limits and enqueue. Caller holds the lock."""
+        if self._queued >= self.max_queue:
+            self._reject("queue_full", "Server is busy, please retry shortly", self._retry_hint())
+        queued_key = (user_id, priority)
+        if self._user_queued.get(queued_key, 0) >= self.max_queue_per_user:
+            self._reject("user_queue_full", "Too many requests in flight", self._retry_hint())
+        if charge:
+            self._consume_token(user_id, priority)
+
+        ticket = _Ticket(user_id, priority)
+        self._queues[priority].setdefault(user_id, deque()).append(ticket)
+        self._queued += 1
+        self._user_queued[queued_key] = self._user_queued.get(queued_key, 0) + 1
+        return ticket
+
+    def _dequeue(self, ticket: _Ticket):
+        """Remove a waiting ticket (timed out). Caller holds the lock."""
+        user_q = self._queues[ticket.priority].get(ticket.user_id)
+        if user_q is not None and ticket in user_q:
+            user_q.remove(ticket)
+            if not user_q:
+                del self._queues[ticket.priority][ticket.user_id]
+            self._unqueue(ticket)
+
+    def _unqueue(self, ticket: _Ticket):
+        """Drop a ticket from the waiting counts. Caller holds the lock."""
+        self._queued -= 1
+        queued_key = (ticket.user_id, ticket.priority)
+        self._user_queued[queued_key] -= 1
+        if not self._user_queued[queued_key]:
+            del self._user_queued[queued_key]
+
+    # ── Dispatch ───────────────────────────────────────
+    def _pop(self, priority: str, older_than: float | None = None) -> _Ticket | None:
+        """Next ticket of a class, round-robin over users under their cap."""
+        users = self._queues[priority]
+        for user_id in list(users):
+            if self._user_running.get((user_id, priority), 0) >= self.per_user_limits[priority]:
+                continue
+            user_q = users[user_id]
+            if older_than is not None and user_q[0].enqueued > older_than:
+                continue
+            ticket = user_q.popleft()
+            if user_q:
+                users.move_to_end(user_id)  # next turn goes to another user
+            else:
+                del users[user_id]
+            return ticket
+        return None
+
+    def _next_ticket(self) -> _Ticket | None:
+        # Aged lower-priority work first, so steady chat load can't starve it
+        now = time.monotonic()
+        for priority, age in self.promote_after.items():
+            ticket = self._pop(priority, older_than=now - age)
+            if ticket is not None:
+                return ticket
+        for priority in PRIORITIES:
+            ticket = self._pop(priority)
+            if ticket is not None:
+                return ticket
+        return None
+
+    def _dispatch(self):
+        """Grant free slots to waiting tickets. Caller holds the lock."""
+        granted = False
+        while self._running < self.max_concurrency:
+            ticket = self._next_ticket()
+            if ticket is None:
+                break
+            ticket.granted = True
+            self._unqueue(ticket)
+            self._running += 1
+            running_key = (ticket.user_id, ticket.priority)
+            self._user_running[running_key] = self._user_running.get(running_key, 0) + 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def _release(self, user_id: int, priority: str, held: float):
+        with self._cond:
+            self._running -= 1
+            running_key = (user_id, priority)
+            self._user_running[running_key] -= 1
+            if not self._user_running[running_key]:
+                del self._user_running[running_key]
+            self._avg_service = 0.8 * self._avg_service + 0.2 * held
+            self._dispatch()
+
+    def max_fanout(self, priority: str, wanted: int) -> int:
+        """
+        Workers one request may run in parallel in a class: no more than can
+        hold slots at once, and fewer than the per-user queue cap, so its own
+        waiting tickets never shed a sibling request of the same class.
+        """
+        return max(1, min(wanted, self.per_user_limits[priority], self.max_queue_per_user - 1))
+
+    def charge(self, user_id: int, priority: str = CHAT, tokens: int = 1):
+        """Charge rate-limit tokens up front, for work later run with slot(charge=False)."""
+        if not SCHED_ENABLED:
+            return
+        with self._cond:
+            self._consume_token(user_id, priority, tokens)
+
+    @contextmanager
+    def slot(self, user_id: int, priority: str = CHAT, charge: bool = True):
+        """Hold a work slot for the enclosed block, waiting in the fair queue if needed."""
+        if not SCHED_ENABLED:
+            yield
+            return
+
+        t0 = time.monotonic()
+        with self._cond:
+            ticket = self._admit(user_id, priority, charge)
+            self._dispatch()
+            deadline = t0 + self.queue_timeout
+            while not ticket.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._dequeue(ticket)
+                    self._reject("queue_timeout", "Server is busy, please retry shortly",
+                                 self._retry_hint())
+                self._cond.wait(remaining)
+
+        waited = time.monotonic() - t0
+        queue_wait.observe(priority, waited)
+        metrics.record("queue_wait", waited)
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(user_id, priority, time.monotonic() - started)
+
+
+scheduler = FairScheduler()
@@ -0,0 +1,95 @@
+"""
+Call coalescing — single-flight (concurrent callers with the same key share
+one execution and its result or exception) and latest-wins rebuilds.
+"""
+import threading
+from typing import Callable, Dict, Hashable, TypeVar
+
+from services import metrics
+
+T = TypeVar("T")
+
+shared_calls = metrics.register(metrics.Counter(
+    "app_singleflight_shared_total", "Calls served by joining an identical in-flight call.", "group"
+))
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Run fn() unless a call with this key is in flight; then wait for and share its outcome."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            shared_calls.inc(self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class LatestRebuild:
+    """
+    Per-key rebuild coalescing. Each request registers a generation and its
+    spec, then waits for the key's lock; the holder builds the latest
+    registered spec, so requests already covered by that build return
+    without rebuilding. Builds for one key never overlap, so an older build
+    can never land after a newer one.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._requested: Dict[Hashable, tuple[int, object]] = {}
+        self._done: Dict[Hashable, int] = {}
+
+    def request(self, key: Hashable, spec, build: Callable[[object], None]) -> bool:
+        """Ensure a build covering `spec` has run; returns False if another caller's build covered it."""
+        with self._lock:
+            self._seq += 1
+            gen = self._seq
+            self._requested[key] = (gen, spec)
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if self._done.get(key, 0) >= gen:
+                    shared_calls.inc(self.name)
+                    return False
+                latest_gen, latest_spec = self._requested[key]
+
+            build(latest_spec)  # on error nothing is marked done; the next waiter retries
+
+            with self._lock:
+                self._done[key] = latest_gen
+            return True
@@ -19,6 +19,7 @@ if os.path.isdir(_FFMPEG_DIR) and _FFMPEG_DIR not in os.environ.get("PATH", ""):
 
 import whisper
 from config import WHISPER_MODEL
+from services.metrics import span
 
 logger = logging.getLogger(__name__)
 
@@ -57,16 +58,18 @@ def _convert_to_wav(input_path: str) -> str:
 def speech_to_text(audio_path: str) -> str:
     """Transcribe audio to text with format conversion for accuracy."""
     # Convert to WAV for much better Whisper accuracy
-    wav_path = _convert_to_wav(audio_path)
+    with span("ffmpeg"):
+        wav_path = _convert_to_wav(audio_path)
 
     try:
         logger.info("Transcribing %s with Whisper (model=%s)", wav_path, WHISPER_MODEL)
-        result = model.transcribe(
-            wav_path,
-            fp16=False,
-            language="en",
-            initial_prompt="This is a clear English question about documents or general knowledge.",
-        )
+        with span("whisper"):
+            result = model.transcribe(
+                wav_path,
+                fp16=False,
+                language="en",
+                initial_prompt="This is a clear English question about documents or general knowledge.",
+            )
         text = result["text"].strip()
         logger.info("Transcription result: %s", text)
         return text
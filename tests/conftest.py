@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# config.py creates UPLOAD_DIR on import — keep it out of the repo
+os.environ.setdefault("UPLOAD_DIR", tempfile.mkdtemp(prefix="test_uploads_"))
+# Router tests use a throwaway SQLite DB instead of the configured MySQL
+os.environ.setdefault(
+    "DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="test_db_"), "test.db")
+)
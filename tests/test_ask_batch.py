@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+# The chat router loads Whisper and the embedding model on import
+pytest.importorskip("whisper")
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("gtts")
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from auth import get_current_user
+from database import Base, SessionLocal, engine
+from models import Message, User
+from routers import chat_router
+
+
+@pytest.fixture
+def client(monkeypatch):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = User(username="batch", email="batch@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+
+    def fake_get_answers(questions, user_id):
+        def results():
+            # Completion order differs from request order, as with a real pool
+            for i in reversed(range(len(questions))):
+                if questions[i] == "boom":
+                    yield i, HTTPException(status_code=429, detail="Rate limit exceeded")
+                else:
+                    yield i, (f"answer to {questions[i]}", "general")
+        return results()
+
+    monkeypatch.setattr(chat_router, "get_answers", fake_get_answers)
+    app = FastAPI()
+    app.include_router(chat_router.router)
+    app.dependency_overrides[get_current_user] = lambda: user
+    yield TestClient(app)
+
+    db.close()
+    Base.metadata.drop_all(bind=engine)
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_ask_batch_index_refers_to_request_list(client):
+    questions = ["a", " ", "boom", "", "b"]
+    response = client.post("/api/chat/ask_batch", json={"questions": questions})
+    assert response.status_code == 200
+
+    *lines, done = _lines(response)
+    by_index = {line["index"]: line for line in lines}
+    assert sorted(by_index) == [0, 2, 4]
+    for i, line in by_index.items():
+        assert line["question"] == questions[i]
+    assert by_index[4]["answer"] == "answer to b"
+    assert by_index[2]["status"] == 429
+    assert done == {"done": True, "session_id": done["session_id"], "answered": 2, "failed": 1}
+
+    db = SessionLocal()
+    try:
+        saved = [m.content for m in db.query(Message).order_by(Message.id)]
+    finally:
+        db.close()
+    assert saved == ["a", "answer to a", "b", "answer to b"]
+
+
+def test_ask_batch_rejects_only_blank_questions(client):
+    response = client.post("/api/chat/ask_batch", json={"questions": [" ", ""]})
+    assert response.status_code == 400
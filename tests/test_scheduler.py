@@ -0,0 +1,227 @@
+import threading
+import time
+
+import pytest
+
+from services.scheduler import BATCH, CHAT, INGEST, FairScheduler, Overloaded
+
+UNLIMITED = {CHAT: (1000.0, 1000), BATCH: (1000.0, 1000), INGEST: (1000.0, 1000)}
+
+
+def _scheduler(**kwargs) -> FairScheduler:
+    opts = dict(max_concurrency=1, per_user_concurrency=1, per_user_limits={}, rates=UNLIMITED,
+                max_queue=50, max_queue_per_user=20, queue_timeout=5.0, promote_after={})
+    opts.update(kwargs)
+    return FairScheduler(**opts)
+
+
+def _wait_for(cond, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.001)
+
+
+class _Harness:
+    """Holds the only slot, queues waiters in a known order, then releases."""
+
+    def __init__(self, sched: FairScheduler):
+        self.sched = sched
+        self.order = []
+        self.errors = []
+        self.threads = []
+        self._release = threading.Event()
+        self._spawn(0, CHAT, hold=True)
+        _wait_for(lambda: sched._running == 1)
+
+    def _spawn(self, user_id, priority, hold=False):
+        def run():
+            try:
+                with self.sched.slot(user_id, priority):
+                    if hold:
+                        self._release.wait()
+                    else:
+                        self.order.append((user_id, priority))
+            except Overloaded as e:
+                self.errors.append(e)
+
+        t = threading.Thread(target=run)
+        self.threads.append(t)
+        t.start()
+
+    def enqueue(self, user_id, priority=CHAT):
+        queued = self.sched._queued
+        self._spawn(user_id, priority)
+        _wait_for(lambda: self.sched._queued == queued + 1)
+
+    def run(self):
+        self._release.set()
+        for t in self.threads:
+            t.join(5)
+        return self.order
+
+
+def test_round_robin_across_users():
+    h = _Harness(_scheduler())
+    for user_id in (1, 1, 1, 2, 2, 3):
+        h.enqueue(user_id)
+    users = [u for u, _ in h.run()]
+    assert users == [1, 2, 3, 1, 2, 1]
+
+
+def test_chat_before_ingest():
+    h = _Harness(_scheduler())
+    h.enqueue(1, INGEST)
+    h.enqueue(2, CHAT)
+    h.enqueue(3, CHAT)
+    assert h.run() == [(2, CHAT), (3, CHAT), (1, INGEST)]
+
+
+def test_aged_ingest_is_promoted_over_chat():
+    h = _Harness(_scheduler(promote_after={INGEST: 0.05}))
+    h.enqueue(1, INGEST)
+    time.sleep(0.1)
+    h.enqueue(2, CHAT)
+    assert h.run() == [(1, INGEST), (2, CHAT)]
+
+
+def test_per_user_cap():
+    sched = _scheduler(max_concurrency=4, per_user_concurrency=2)
+    running = {"now": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def work():
+        with sched.slot(1):
+            with lock:
+                running["now"] += 1
+                running["peak"] = max(running["peak"], running["now"])
+            time.sleep(0.02)
+            with lock:
+                running["now"] -= 1
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert running["peak"] == 2
+    assert sched._running == 0 and sched._queued == 0
+
+
+def _peak_running(sched, priority, n):
+    running = {"now": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def work():
+        with sched.slot(1, priority):
+            with lock:
+                running["now"] += 1
+                running["peak"] = max(running["peak"], running["now"])
+            time.sleep(0.02)
+            with lock:
+                running["now"] -= 1
+
+    threads = [threading.Thread(target=work) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    return running["peak"]
+
+
+def test_batch_has_its_own_per_user_cap():
+    sched = _scheduler(max_concurrency=8, per_user_concurrency=1, per_user_limits={BATCH: 4})
+    assert _peak_running(sched, BATCH, 8) == 4
+    assert _peak_running(sched, CHAT, 4) == 1
+
+
+def test_charge_is_proportional_to_tokens():
+    sched = _scheduler(rates={**UNLIMITED, BATCH: (1.0, 10)})
+    sched.charge(1, BATCH, tokens=8)
+    with pytest.raises(Overloaded) as exc:
+        sched.charge(1, BATCH, tokens=5)
+    assert int(exc.value.headers["Retry-After"]) >= 3
+    sched.charge(1, BATCH, tokens=2)
+    # more than the burst can ever hold is shed, with a capped hint
+    with pytest.raises(Overloaded):
+        sched.charge(2, BATCH, tokens=11)
+
+
+def test_token_bucket_sheds_with_retry_after():
+    sched = _scheduler(rates={**UNLIMITED, CHAT: (0.5, 2), INGEST: (1.0, 1)})
+    for _ in range(2):
+        with sched.slot(7):
+            pass
+    with pytest.raises(Overloaded) as exc:
+        with sched.slot(7):
+            pass
+    assert exc.value.status_code == 429
+    assert int(exc.value.headers["Retry-After"]) >= 1
+    # other users and other classes have their own buckets
+    with sched.slot(8):
+        pass
+    with sched.slot(7, INGEST):
+        pass
+
+
+def test_charge_false_skips_bucket():
+    sched = _scheduler(rates={**UNLIMITED, CHAT: (0.0, 1)})
+    sched.charge(1)
+    with pytest.raises(Overloaded):
+        sched.charge(1)
+    for _ in range(3):
+        with sched.slot(1, charge=False):
+            pass
+
+
+def test_queue_timeout_cleans_up_counters():
+    h = _Harness(_scheduler(queue_timeout=0.05))
+    h.enqueue(1)
+    h.enqueue(1)
+    _wait_for(lambda: len(h.errors) == 2)
+    assert h.sched._queued == 0
+    assert not h.sched._user_queued
+    assert not h.sched._queues[CHAT]
+    h.run()
+    assert h.sched._running == 0
+
+
+def test_user_queue_limit():
+    h = _Harness(_scheduler(max_queue_per_user=1))
+    h.enqueue(1)
+    with pytest.raises(Overloaded):
+        with h.sched.slot(1):
+            pass
+    assert h.run() == [(1, CHAT)]
+
+
+def test_user_queue_limit_is_per_class():
+    h = _Harness(_scheduler(max_queue_per_user=4, per_user_limits={BATCH: 4}))
+    for _ in range(4):
+        h.enqueue(1, BATCH)
+    with pytest.raises(Overloaded):
+        with h.sched.slot(1, BATCH):
+            pass
+    # A full batch queue doesn't shed the same user's chat or upload
+    h.enqueue(1, CHAT)
+    h.enqueue(1, INGEST)
+    order = h.run()
+    assert order[0] == (1, CHAT)
+    assert order.count((1, BATCH)) == 4 and (1, INGEST) in order
+
+
+def test_batch_fanout_stays_below_user_queue_cap():
+    sched = _scheduler(max_queue_per_user=4, per_user_limits={BATCH: 8})
+    workers = sched.max_fanout(BATCH, 16)
+    assert workers == 3
+
+    # One batch's workers all waiting still leave room for another batch
+    h = _Harness(sched)
+    for _ in range(workers):
+        h.enqueue(1, BATCH)
+    h.enqueue(1, BATCH)
+    assert not h.errors
+    h.run()
+
+    assert _scheduler(max_queue_per_user=1).max_fanout(BATCH, 4) == 1
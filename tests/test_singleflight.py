@@ -0,0 +1,133 @@
+import threading
+import time
+
+import pytest
+
+from services.singleflight import LatestRebuild, SingleFlight
+
+
+def _wait_for(cond, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.001)
+
+
+def _run_concurrently(flight, key, fn, n):
+    """Start a leader blocked inside fn, then n-1 followers; return their outcomes."""
+    outcomes = []
+    lock = threading.Lock()
+
+    def call():
+        try:
+            result = flight.do(key, fn)
+        except Exception as e:
+            result = e
+        with lock:
+            outcomes.append(result)
+
+    threads = [threading.Thread(target=call) for _ in range(n)]
+    threads[0].start()
+    _wait_for(lambda: key in flight._calls)
+    for t in threads[1:]:
+        t.start()
+    return threads, outcomes
+
+
+def test_single_flight_shares_result():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(2)
+        return "answer"
+
+    threads, outcomes = _run_concurrently(flight, "q", fn, 5)
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert calls == [1]
+    assert outcomes == ["answer"] * 5
+    assert flight._calls == {}
+
+
+def test_single_flight_shares_exception():
+    flight = SingleFlight("test")
+    release = threading.Event()
+
+    def fn():
+        release.wait(2)
+        raise ValueError("boom")
+
+    threads, outcomes = _run_concurrently(flight, "q", fn, 3)
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert len(outcomes) == 3
+    assert all(isinstance(o, ValueError) for o in outcomes)
+    # the key is free again after a failure
+    assert flight.do("q", lambda: 42) == 42
+
+
+def test_single_flight_distinct_keys_run_separately():
+    flight = SingleFlight("test")
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+
+
+def test_latest_rebuild_coalesces_and_never_goes_backwards():
+    rebuilds = LatestRebuild("test")
+    first_started = threading.Event()
+    release_first = threading.Event()
+    built = []        # specs in build order
+    installed = []    # what the "index" holds after each build
+
+    def build(spec):
+        if spec == "v1":
+            first_started.set()
+            release_first.wait(2)
+        built.append(spec)
+        installed.append(spec)
+
+    results = {}
+
+    def request(spec):
+        results[spec] = rebuilds.request("user", spec, build)
+
+    t1 = threading.Thread(target=request, args=("v1",))
+    t1.start()
+    first_started.wait(2)
+    later = []
+    for spec in ("v2", "v3"):
+        t = threading.Thread(target=request, args=(spec,))
+        later.append(t)
+        t.start()
+        _wait_for(lambda: rebuilds._requested["user"][1] == spec)
+    release_first.set()
+    for t in [t1, *later]:
+        t.join(5)
+
+    # v1 ran, then exactly one build of the newest spec covered v2 and v3
+    assert built == ["v1", "v3"]
+    assert installed[-1] == "v3"
+    assert results["v1"] is True
+    assert sorted([results["v2"], results["v3"]]) == [False, True]
+
+
+def test_latest_rebuild_failure_lets_next_caller_retry():
+    rebuilds = LatestRebuild("test")
+    attempts = []
+
+    def failing(spec):
+        attempts.append(spec)
+        raise RuntimeError("shed")
+
+    with pytest.raises(RuntimeError):
+        rebuilds.request("user", "v1", failing)
+    assert rebuilds.request("user", "v2", attempts.append) is True
+    assert attempts == ["v1", "v2"]